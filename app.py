@@ -4,33 +4,107 @@ Stock Market RAG System - FastAPI Backend
 Bridges the query engine to the web UI.
 """
 
+import asyncio
+import multiprocessing
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 
 # Make sure the project root is on the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional
+import numpy as np
 import re
 
+from semantic_cache_module import SemanticCache
+
+_WORD4 = re.compile(r'\b\w{4,}\b')
+
+# Embedding, Chroma search and model loading are CPU-bound and blocking;
+# they run here so the event loop keeps accepting connections.
+_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+
+
+# Reference phrases for routing a query to the analysis or the facts branch
+ANALYSIS_INTENT_TEXT = "volatility risk signal trend analysis"
+FACTS_INTENT_TEXT = "what is who when describe explain"
+INTENT_MARGIN = 0.1
+# Trend, signal and risk only come from the analysis branch, so a query
+# naming them is never routed to facts alone
+_ANALYSIS_KEYWORDS = re.compile(r'\b(?:trends?|signals?|volatil\w*|risk\w*|buy|sell)\b', re.IGNORECASE)
+
+
 # -----------------------------------------------
-# LAZY-LOAD HEAVY MODULES (avoids slow startup)
+# STARTUP: LOAD HEAVY MODULES ONCE
 # -----------------------------------------------
-_collection = None
-_embedding_model = None
+def load_models():
+    import torch
+    from vector_db_module import collection, embedding_model
+    from query_encoder_module import load_query_encoder
+
+    # Device placement and FP16 are decided once in vector_db_module
+    torch.set_num_threads(os.cpu_count() or 1)
+    embedding_model.eval()
+
+    # Queries use the int8 ONNX export when present (python query_encoder_module.py)
+    model = load_query_encoder(embedding_model)
+    intent_refs = model.encode(
+        [ANALYSIS_INTENT_TEXT, FACTS_INTENT_TEXT],
+        normalize_embeddings=True
+    )
+    return collection, model, np.asarray(intent_refs, dtype=np.float32)
+
+
+def create_process_pool() -> ProcessPoolExecutor:
+    # Fact extraction and statistics are pure-Python CPU work; running them in
+    # worker processes lets concurrent requests use every core instead of
+    # sharing one GIL. "spawn" keeps the workers free of torch/Chroma state,
+    # which they never touch.
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count() or 4,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+async def run_in_process_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    pool = app.state.process_pool
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # A crashed worker breaks the pool for good; replace it (once, even
+        # when several requests see the failure) and retry a single time
+        if app.state.process_pool is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            app.state.process_pool = create_process_pool()
+        return await loop.run_in_executor(app.state.process_pool, func, *args)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop = asyncio.get_running_loop()
+    collection, model, intent_refs = await loop.run_in_executor(_executor, load_models)
+    app.state.collection = collection
+    app.state.model = model
+    app.state.intent_refs = intent_refs
+    app.state.process_pool = create_process_pool()
+    _encode_batcher.start()
+    yield
+    try:
+        await _encode_batcher.stop()
+    finally:
+        app.state.process_pool.shutdown(cancel_futures=True)
 
 
 def get_collection_and_model():
-    global _collection, _embedding_model
-    if _collection is None or _embedding_model is None:
-        from vector_db_module import collection, embedding_model
-        _collection = collection
-        _embedding_model = embedding_model
-    return _collection, _embedding_model
+    return app.state.collection, app.state.model
 
 
 # -----------------------------------------------
@@ -39,7 +113,9 @@ def get_collection_and_model():
 app = FastAPI(
     title="Stock Market RAG API",
     description="NIFTY 50 Retrieval-Augmented Generation Query System",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Mount the frontend static directory
@@ -85,18 +161,17 @@ class QueryResponse(BaseModel):
 # -----------------------------------------------
 # HELPER FUNCTIONS (adapted from query_engine.py)
 # -----------------------------------------------
-def search_documents(query: str, n_results: int = 3):
-    collection, embedding_model = get_collection_and_model()
-    try:
+def search_documents(query: str, n_results: int = 3, query_embedding: np.ndarray = None):
+    collection, _ = get_collection_and_model()
+    if query_embedding is not None:
         results = collection.query(
-            query_texts=[query],
+            query_embeddings=[query_embedding.tolist()],
             n_results=n_results,
             include=["documents", "metadatas", "distances"]
         )
-    except Exception:
-        query_embedding = embedding_model.encode([query])
+    else:
         results = collection.query(
-            query_embeddings=query_embedding.tolist(),
+            query_texts=[query],
             n_results=n_results,
             include=["documents", "metadatas", "distances"]
         )
@@ -105,49 +180,63 @@ def search_documents(query: str, n_results: int = 3):
     metadatas = results.get("metadatas", [[]])[0] if results else []
     distances = results.get("distances", [[]])[0] if results else []
 
-    filtered_docs, filtered_meta, filtered_dist = [], [], []
-    for doc, meta, dist in zip(documents, metadatas, distances):
-        if dist < 1.8:
-            filtered_docs.append(doc)
-            filtered_meta.append(meta)
-            filtered_dist.append(dist)
+    dists = np.asarray(distances, dtype=np.float32)
+    mask = dists < 0.9
+    idx = np.nonzero(mask)[0]
+    filtered_docs = [documents[i] for i in idx]
+    filtered_meta = [metadatas[i] for i in idx]
+    filtered_dist = dists[mask].tolist()
 
     return filtered_docs, filtered_meta, filtered_dist
 
 
+def split_sentences(text: str) -> list:
+    """
+    Split after '.', '!' or '?' followed by whitespace using only C string
+    ops. Whitespace is collapsed first, so a single space marks every
+    boundary; decimals like 22,150.35 are left intact.
+    """
+    text = " ".join(text.split())
+    for ch in ".!?":
+        text = text.replace(ch + " ", ch + "\x00")
+    return text.split("\x00")
+
+
 def generate_answer(question: str, documents: list, metadatas: list = None) -> str:
     if not documents:
         return "Sorry, I could not find relevant information to answer your question."
 
     question_lower = question.lower()
-    extracted_facts = []
+    question_keywords = _WORD4.findall(question_lower)
+    # One alternation over all keywords: a sentence is scanned once in C
+    # instead of once per keyword
+    keyword_pattern = re.compile("|".join(map(re.escape, question_keywords))) if question_keywords else None
+    top_facts = []
+    seen = set()
     sources_used = []
 
     for i, doc in enumerate(documents):
-        sentences = re.split(r'(?<=[.!?])\s+', doc.strip())
-        for sentence in sentences:
-            sent_lower = sentence.lower()
-            question_keywords = re.findall(r'\b\w{4,}\b', question_lower)
-            matches = sum(1 for kw in question_keywords if kw in sent_lower)
-            if matches >= 1 and len(sentence) > 30:
-                extracted_facts.append(sentence.strip())
-
         if metadatas:
             src = metadatas[i].get("source", "")
             if src:
                 sources_used.append(src)
 
-    seen = set()
-    unique_facts = []
-    for f in extracted_facts:
-        if f not in seen:
-            seen.add(f)
-            unique_facts.append(f)
-    top_facts = unique_facts[:5]
+        if keyword_pattern is not None:
+            for fact in split_sentences(doc):
+                if len(fact) > 30 and keyword_pattern.search(fact.lower()):
+                    if fact not in seen:
+                        seen.add(fact)
+                        top_facts.append(fact)
+                        if len(top_facts) >= 5:
+                            break
+
+        # Five facts is all the answer shows; later documents are not parsed
+        if len(top_facts) >= 5:
+            break
 
     if not top_facts:
-        fallback_sentences = re.split(r'(?<=[.!?])\s+', documents[0].strip())
-        top_facts = [s.strip() for s in fallback_sentences[:3] if len(s) > 30]
+        fallback_sentences = split_sentences(documents[0])
+        top_facts = [s for s in fallback_sentences[:3] if len(s) > 30]
 
     if not top_facts:
         return "I found some relevant documents but could not extract specific facts. Please try rephrasing your question."
@@ -182,11 +271,129 @@ def run_statistical_analysis(documents: list) -> AnalysisResult:
     )
 
 
+def classify_intent(query: str, query_embedding: np.ndarray) -> Optional[str]:
+    """'analysis', 'facts', or None when the query is not clearly either."""
+    sim_analysis, sim_facts = app.state.intent_refs @ query_embedding
+    if sim_analysis > sim_facts + INTENT_MARGIN:
+        return "analysis"
+    if sim_facts > sim_analysis + INTENT_MARGIN and not _ANALYSIS_KEYWORDS.search(query):
+        return "facts"
+    return None
+
+
+# -----------------------------------------------
+# SEMANTIC RESPONSE CACHE
+# -----------------------------------------------
+# Paraphrases of a previous question are answered from memory: the query
+# embedding is compared against the embeddings of earlier queries and, above
+# the threshold, the stored response is returned without touching Chroma.
+# A repeat of the same question (up to case and whitespace) is matched on
+# its text first, so it skips the encoder as well.
+CACHE_SIMILARITY_THRESHOLD = 0.95
+CACHE_CAPACITY = 1024
+EMBEDDING_DIMENSION = 384
+
+# Stored as float16 (half the memory); upcast to float32 for scoring
+_response_cache = SemanticCache(
+    CACHE_CAPACITY, EMBEDDING_DIMENSION, CACHE_SIMILARITY_THRESHOLD, dtype=np.float16
+)
+
+
+# -----------------------------------------------
+# QUERY ENCODE BATCHER
+# -----------------------------------------------
+def encode_queries(queries: list[str]) -> np.ndarray:
+    _, embedding_model = get_collection_and_model()
+    embeddings = embedding_model.encode(
+        queries,
+        batch_size=32,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+class EncodeBatcher:
+    """
+    Coalesces concurrent query encodes into one model forward pass.
+    Requests wait at most `max_wait` seconds for company before the
+    batch (up to `max_batch` queries) is encoded on the executor.
+    The queue and worker task belong to the loop that calls `start()`;
+    the app starts and stops them in its lifespan.
+    """
+
+    def __init__(self, max_batch: int = 32, max_wait: float = 0.005):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def encode(self, query: str) -> np.ndarray:
+        if self._task is None or self._task.done():
+            raise RuntimeError("Query encoder is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                queries = [query for query, _ in batch]
+                try:
+                    embeddings = await loop.run_in_executor(_executor, encode_queries, queries)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                for (_, future), embedding in zip(batch, embeddings):
+                    if not future.done():
+                        future.set_result(embedding)
+        finally:
+            # Never leave a caller waiting on a worker that has exited
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Query encoder stopped"))
+
+
+_encode_batcher = EncodeBatcher()
+
+
 # -----------------------------------------------
 # ROUTES
 # -----------------------------------------------
 @app.get("/")
-def serve_index():
+async def serve_index():
     index_path = os.path.join(FRONTEND_DIR, "index.html")
     if os.path.exists(index_path):
         return FileResponse(index_path)
@@ -194,10 +401,11 @@ def serve_index():
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
+    loop = asyncio.get_running_loop()
     try:
         collection, _ = get_collection_and_model()
-        doc_count = collection.count()
+        doc_count = await loop.run_in_executor(_executor, collection.count)
         return {
             "status": "healthy",
             "vector_db": "connected",
@@ -211,30 +419,44 @@ def health_check():
 
 
 @app.post("/query", response_model=QueryResponse)
-def query_stocks(request: QueryRequest):
+async def query_stocks(request: QueryRequest):
     if not request.query or len(request.query.strip()) < 3:
         raise HTTPException(status_code=400, detail="Query must be at least 3 characters long.")
     if len(request.query) > 500:
         raise HTTPException(status_code=400, detail="Query is too long (max 500 chars).")
 
+    loop = asyncio.get_running_loop()
     try:
-        docs, metas, dists = search_documents(request.query, request.n_results)
+        cached = _response_cache.get_text(request.query, request.n_results)
+        if cached is not None:
+            return cached.model_copy(update={"question": request.query})
+
+        query_embedding = await _encode_batcher.encode(request.query)
+        cached = _response_cache.get(query_embedding, request.n_results)
+        if cached is not None:
+            return cached.model_copy(update={"question": request.query})
+
+        docs, metas, dists = await loop.run_in_executor(
+            _executor, search_documents, request.query, request.n_results, query_embedding
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
     if not docs:
-        return QueryResponse(
+        response = QueryResponse(
             question=request.query,
             answer="No relevant documents found for your query. Try different keywords related to NIFTY 50 stocks.",
             results=[],
             analysis=AnalysisResult(status="No data available"),
             doc_count=0
         )
+        _response_cache.put(query_embedding, response, request.n_results, text=request.query)
+        return response
 
     # Build result list
     results = []
-    for doc, meta, dist in zip(docs, metas, dists):
-        relevance_pct = max(0.0, round((1 - dist / 2.0) * 100, 1))
+    relevance = ((1 - np.asarray(dists)) * 100).round(1).clip(min=0)
+    for doc, meta, relevance_pct in zip(docs, metas, relevance.tolist()):
         content_preview = doc[:500].strip() if len(doc) > 500 else doc.strip()
         results.append(QueryResult(
             content=content_preview,
@@ -243,19 +465,30 @@ def query_stocks(request: QueryRequest):
             relevance=relevance_pct
         ))
 
-    # Generate answer
-    answer = generate_answer(request.query, docs, metas)
-
-    # Statistical analysis
-    analysis = run_statistical_analysis(docs)
+    # Generate answer and statistical analysis in parallel, skipping the
+    # branch the question clearly does not need
+    intent = classify_intent(request.query, query_embedding)
+    if intent == "analysis":
+        answer = "See analysis panel."
+        analysis = await run_in_process_pool(run_statistical_analysis, docs)
+    elif intent == "facts":
+        answer = await run_in_process_pool(generate_answer, request.query, docs, metas)
+        analysis = AnalysisResult(status="Skipped for factual question")
+    else:
+        answer, analysis = await asyncio.gather(
+            run_in_process_pool(generate_answer, request.query, docs, metas),
+            run_in_process_pool(run_statistical_analysis, docs)
+        )
 
-    return QueryResponse(
+    response = QueryResponse(
         question=request.query,
         answer=answer,
         results=results,
         analysis=analysis,
         doc_count=len(docs)
     )
+    _response_cache.put(query_embedding, response, request.n_results, text=request.query)
+    return response
 
 
 # -----------------------------------------------
@@ -263,4 +496,13 @@ def query_stocks(request: QueryRequest):
 # -----------------------------------------------
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
+    # uvicorn picks uvloop/httptools itself when installed (not on Windows);
+    # auto-reload only works with a single worker
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=workers == 1,
+        workers=workers
+    )
@@ -1,10 +1,13 @@
 # file: data_collection_module.py
 
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from selectolax.lexbor import LexborHTMLParser
 import re
-import json
 from datetime import datetime
+from pathlib import Path
+import orjson
 
 # -------------------------
 # CONFIG
@@ -18,27 +21,51 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (NIFTY academic project)"
 }
 
+# Validators + body of the last successful fetch per URL, for conditional GETs
+CACHE_META_FILE = ".cache_meta.json"
+
 # -------------------------
 # FETCH PAGE
 # -------------------------
-def fetch_page(url):
-    response = requests.get(url, headers=HEADERS, timeout=20)
+def load_cache_meta():
+    try:
+        return orjson.loads(Path(CACHE_META_FILE).read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return {}
+
+def save_cache_meta(cache_meta):
+    Path(CACHE_META_FILE).write_bytes(orjson.dumps(cache_meta))
+
+async def fetch_page(client, url, cache_meta):
+    headers = {}
+    cached = cache_meta.get(url)
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = await client.get(url, headers=headers, timeout=20)
+    # Unchanged since the last run: reuse the stored page, nothing downloaded
+    if response.status_code == 304 and cached:
+        return cached["html"]
     response.raise_for_status()
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        cache_meta[url] = {"etag": etag, "last_modified": last_modified, "html": response.text}
     return response.text
 
 # -------------------------
 # EXTRACT TEXT
 # -------------------------
 def extract_text(html):
-    soup = BeautifulSoup(html, "html.parser")
-
-    # Remove unwanted tags
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
+    tree = LexborHTMLParser(html)
 
     paragraphs = []
-    for p in soup.find_all("p"):
-        text = p.get_text(" ", strip=True)
+    for p in tree.css("p"):
+        text = p.text(separator=" ", strip=True)
         if len(text) > 40:
             paragraphs.append(text)
 
@@ -52,30 +79,47 @@ def extract_prices(text):
     prices = re.findall(r"\d{1,3}(?:,\d{3})*(?:\.\d+)?", text)
     return prices[:10]  # return first few matches
 
+# -------------------------
+# BUILD CORPUS ENTRY
+# -------------------------
+def build_entry(url, html):
+    clean_text = extract_text(html)
+    prices = extract_prices(clean_text)
+
+    return {
+        "source": url,
+        "timestamp": str(datetime.now()),
+        "text": clean_text[:2000],  # limit size
+        "prices_found": prices
+    }
+
+async def fetch_and_parse(client, pool, cache_meta, url):
+    print("Fetching:", url)
+    html = await fetch_page(client, url, cache_meta)
+    # Parse off the event loop so it overlaps with the remaining fetches
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, build_entry, url, html)
+
+async def collect_corpus():
+    cache_meta = load_cache_meta()
+    with ThreadPoolExecutor() as pool:
+        # One keep-alive client for all URLs; httpx negotiates gzip by default
+        async with httpx.AsyncClient(http2=True, headers=HEADERS, follow_redirects=True) as client:
+            corpus_data = await asyncio.gather(
+                *(fetch_and_parse(client, pool, cache_meta, url) for url in URLS)
+            )
+    save_cache_meta(cache_meta)
+    return corpus_data
+
 # -------------------------
 # MAIN
 # -------------------------
 def main():
-    corpus_data = []
-
-    for url in URLS:
-        print("Fetching:", url)
-        html = fetch_page(url)
-        clean_text = extract_text(html)
-        prices = extract_prices(clean_text)
-
-        entry = {
-            "source": url,
-            "timestamp": str(datetime.now()),
-            "text": clean_text[:2000],  # limit size
-            "prices_found": prices
-        }
-
-        corpus_data.append(entry)
+    # All URLs are fetched concurrently; entries keep the order of URLS
+    corpus_data = asyncio.run(collect_corpus())
 
     # Save corpus for next module
-    with open("nifty_corpus.json", "w", encoding="utf-8") as f:
-        json.dump(corpus_data, f, indent=4)
+    Path("nifty_corpus.json").write_bytes(orjson.dumps(corpus_data, option=orjson.OPT_INDENT_2))
 
     print("\nData collection completed.")
     print("Saved to nifty_corpus.json")
@@ -9,6 +9,13 @@ from vector_db_module import search_market_data
 from statistical_analysis_module import analyze_documents
 from query_engine import simple_generator
 
+# Example queries
+DEMO_QUERIES = [
+    "What is the current market trend?",
+    "Analyze the market volatility",
+    "What is the trading signal for NIFTY?"
+]
+
 def print_section(title):
     """Print formatted section header."""
     print(f"\n{'='*70}")
@@ -60,16 +67,9 @@ def main():
     print("\nThis demonstration shows the system in action.")
     print("It performs semantic search + analysis + RAG generation.\n")
     
-    # Example queries
-    queries = [
-        "What is the current market trend?",
-        "Analyze the market volatility",
-        "What is the trading signal for NIFTY?"
-    ]
-    
     successful = 0
     
-    for i, query in enumerate(queries, 1):
+    for i, query in enumerate(DEMO_QUERIES, 1):
         print_section(f"EXAMPLE QUERY {i}")
         if demonstrate_query(query, i):
             successful += 1
@@ -2,18 +2,63 @@
 
 import json
 
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def _sma_series(prices, window):
+    """Rolling mean over every full window, using a running sum."""
+    out = np.empty(len(prices) - window + 1)
+    total = prices[:window].sum()
+    out[0] = total / window
+    for i in range(window, len(prices)):
+        total += prices[i] - prices[i - window]
+        out[i - window + 1] = total / window
+    return out
+
+
+@njit(cache=True, fastmath=True)
+def _wilder_rsi(prices, window):
+    """RSI with Wilder's smoothing of average gains and losses."""
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, window + 1):
+        change = prices[i] - prices[i - 1]
+        if change > 0:
+            avg_gain += change
+        else:
+            avg_loss -= change
+    avg_gain /= window
+    avg_loss /= window
+
+    for i in range(window + 1, len(prices)):
+        change = prices[i] - prices[i - 1]
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        avg_gain = (avg_gain * (window - 1) + gain) / window
+        avg_loss = (avg_loss * (window - 1) + loss) / window
+
+    if avg_loss == 0.0:
+        # A flat series has no momentum either way: neutral, not overbought
+        return 50.0 if avg_gain == 0.0 else 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
 def calculate_sma(prices, window=3):
-    """Calculates Simple Moving Average."""
+    """Calculates Simple Moving Average (latest full window)."""
     if len(prices) < window:
         return None
-    sma = sum(prices[:window]) / window
-    return round(sma, 2)
+    sma = _sma_series(np.asarray(prices, dtype=np.float64), window)[-1]
+    return round(float(sma), 2)
 
 def calculate_rsi(prices, window=14):
-    """Placeholder for RSI calculation logic."""
-    # RSI requires more data points than we currently have in the sample
-    # Typically: RSI = 100 - (100 / (1 + RS))
-    return "Insufficient data for RSI"
+    """Calculates the Relative Strength Index: RSI = 100 - (100 / (1 + RS))."""
+    # Needs one more price than the window to form `window` price changes
+    if len(prices) <= window:
+        return "Insufficient data for RSI"
+    rsi = _wilder_rsi(np.asarray(prices, dtype=np.float64), window)
+    return round(float(rsi), 2)
 
 def main():
     try:
@@ -1,38 +1,39 @@
 # file: preprocessing_module.py
 
-import json
 import re
+from pathlib import Path
+
+import numpy as np
+import orjson
+import pandas as pd
+
+_URL = re.compile(r'http\S+|www\S+|https\S+', re.MULTILINE)
+_NONALPHA = re.compile(r'[^a-z\s]')
 
 def clean_text(text):
     # Convert to lowercase
     text = text.lower()
     # Remove URLs
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = _URL.sub('', text)
     # Remove special characters and numbers from the text (keep alpha only for basic cleaning)
-    text = re.sub(r'[^a-z\s]', '', text)
+    text = _NONALPHA.sub('', text)
     # Remove extra whitespace
     text = " ".join(text.split())
     return text
 
 def clean_prices(prices_list):
-    clean_list = []
-    for price in prices_list:
-        # Remove commas and convert to float
-        try:
-            val = float(price.replace(',', ''))
-            clean_list.append(val)
-        except ValueError:
-            continue
-    return clean_list
+    # Remove commas and convert to float; invalid tokens become NaN and are dropped
+    prices = pd.Series(prices_list, dtype="string").str.replace(',', '', regex=False)
+    values = pd.to_numeric(prices, errors='coerce')
+    return values.dropna().to_numpy(dtype=np.float64).tolist()
 
 def main():
     try:
-        with open("nifty_corpus.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = orjson.loads(Path("nifty_corpus.json").read_bytes())
     except FileNotFoundError:
         print("Error: nifty_corpus.json not found. Run data_collection_module.py first.")
         return
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print("Error: nifty_corpus.json is not valid JSON.")
         return
 
@@ -51,8 +52,7 @@ def main():
         }
         processed_data.append(processed_entry)
 
-    with open("processed_nifty_data.json", "w", encoding="utf-8") as f:
-        json.dump(processed_data, f, indent=4)
+    Path("processed_nifty_data.json").write_bytes(orjson.dumps(processed_data, option=orjson.OPT_INDENT_2))
 
     print("✓ Preprocessing completed. Data saved to processed_nifty_data.json")
     print(f"  Processed {len(processed_data)} records.")
@@ -0,0 +1,101 @@
+# file: query_encoder_module.py
+
+import os
+
+import numpy as np
+
+# -------------------------
+# CONFIG
+# -------------------------
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIMENSION = 384
+MAX_SEQ_LENGTH = 256
+
+ONNX_EXPORT_DIR = "minilm_onnx"
+ONNX_QUANTIZED_MODEL = "minilm_int8.onnx"
+
+
+# -------------------------
+# ONE-TIME EXPORT
+# -------------------------
+def export_quantized_model(export_dir=ONNX_EXPORT_DIR, quantized_path=ONNX_QUANTIZED_MODEL):
+    """Export MiniLM to ONNX and write an int8 dynamically-quantized copy."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer
+
+    model = ORTModelForFeatureExtraction.from_pretrained(MODEL_NAME, export=True)
+    model.save_pretrained(export_dir)
+    AutoTokenizer.from_pretrained(MODEL_NAME).save_pretrained(export_dir)
+
+    quantize_dynamic(
+        os.path.join(export_dir, "model.onnx"),
+        quantized_path,
+        weight_type=QuantType.QInt8
+    )
+
+
+# -------------------------
+# ONNX RUNTIME ENCODER
+# -------------------------
+class OnnxEncoder:
+    """
+    Drop-in for SentenceTransformer.encode on the query path: HF fast
+    tokenizer + int8 ONNX Runtime session, mean pooling and L2 norm in NumPy.
+    """
+
+    def __init__(self, model_path=ONNX_QUANTIZED_MODEL, tokenizer_dir=ONNX_EXPORT_DIR):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir)
+        self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=True, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+
+        chunks = []
+        for start in range(0, len(sentences), batch_size):
+            tokens = self.tokenizer(
+                list(sentences[start:start + batch_size]),
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            feeds = {k: v.astype(np.int64) for k, v in tokens.items() if k in self._input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real (non-padding) tokens
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            chunks.append(summed / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        if not chunks:
+            return np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
+
+        embeddings = np.concatenate(chunks).astype(np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.clip(norms, 1e-12, None)
+        return embeddings
+
+
+def load_query_encoder(fallback):
+    """Return the int8 ONNX encoder if it has been exported, else `fallback`."""
+    if not os.path.exists(ONNX_QUANTIZED_MODEL):
+        return fallback
+    try:
+        return OnnxEncoder()
+    except ImportError:
+        return fallback
+
+
+# -------------------------
+# RUN
+# -------------------------
+if __name__ == "__main__":
+    export_quantized_model()
+    print(f"Quantized query encoder saved to {ONNX_QUANTIZED_MODEL}")
@@ -1,27 +1,27 @@
-from vector_db_module import collection, embedding_model
+from vector_db_module import collection
 from statistical_analysis_module import analyze_documents
+from itertools import islice
+import numpy as np
 import re
 
+_KEYWORD_RE = re.compile(r'\b\w{4,}\b')
+# A sentence runs up to '.', '!' or '?' followed by whitespace, or to the end
+_SENT_RE = re.compile(r'\S.*?(?:[.!?](?=\s)|\Z)', re.DOTALL)
+_PRICE_RE = re.compile(r'Rs\s?[\d,]+(?:\.\d+)?|USD\s?[\d.]+\s?billion|[\d,]+(?:\.\d+)?%|[\d,]+(?:\.\d+)?\s(?:crore|lakh|million|billion)')
+_MAX_CANDIDATE_FACTS = 20
+
 
 # -----------------------------------------------
 # SEARCH FUNCTION
 # -----------------------------------------------
 def search_and_display(query):
     """Search and display results for a given query."""
-    try:
-        results = collection.query(
-            query_texts=[query],
-            n_results=3,
-            include=["documents", "metadatas", "distances"]
-        )
-    except Exception:
-        # Fallback using embeddings
-        query_embedding = embedding_model.encode([query])
-        results = collection.query(
-            query_embeddings=query_embedding.tolist(),
-            n_results=3,
-            include=["documents", "metadatas", "distances"]
-        )
+    # The collection embeds query_texts with the shared embedding model
+    results = collection.query(
+        query_texts=[query],
+        n_results=3,
+        include=["documents", "metadatas", "distances"]
+    )
 
     documents = results.get("documents", [[]])[0] if results else []
     metadatas = results.get("metadatas", [[]])[0] if results else []
@@ -31,13 +31,13 @@ def search_and_display(query):
         print("No matching documents found.")
         return [], [], []
 
-    # Filter out results that are too dissimilar (distance > 1.5 = not relevant)
-    filtered_docs, filtered_meta, filtered_dist = [], [], []
-    for doc, meta, dist in zip(documents, metadatas, distances):
-        if dist < 1.8:  # Only keep reasonably relevant results
-            filtered_docs.append(doc)
-            filtered_meta.append(meta)
-            filtered_dist.append(dist)
+    # Filter out results that are too dissimilar (cosine distance >= 0.9, i.e. cos <= 0.1)
+    dists = np.asarray(distances)
+    mask = dists < 0.9  # Only keep reasonably relevant results
+    idx = np.where(mask)[0]
+    filtered_docs = [documents[i] for i in idx]
+    filtered_meta = [metadatas[i] for i in idx]
+    filtered_dist = dists[mask].tolist()
 
     if not filtered_docs:
         print("No sufficiently relevant documents found for this query.")
@@ -45,7 +45,7 @@ def search_and_display(query):
 
     print("\nTop Matching Results:\n")
     for i, (doc, meta, dist) in enumerate(zip(filtered_docs, filtered_meta, filtered_dist)):
-        relevance_pct = max(0, round((1 - dist / 2.0) * 100, 1))
+        relevance_pct = max(0, round((1 - dist) * 100, 1))
         print(f"Result {i+1}  [Relevance: {relevance_pct}%]")
         print("Source:", meta.get("source", "Unknown"))
         print("Date:", meta.get("timestamp", "Unknown"))
@@ -59,6 +59,39 @@ def search_and_display(query):
 # -----------------------------------------------
 # SMART ANSWER GENERATOR
 # -----------------------------------------------
+# Parsed once at import; rendered per answer with str.format_map
+_ANSWER_TMPL = """
+===================================================
+  RAG Answer — NIFTY 50 Stock Market System
+===================================================
+
+Question: {question}
+
+---------------------------------------------------
+Key Facts From Retrieved Documents:
+---------------------------------------------------
+• {facts_text}
+
+---------------------------------------------------
+Key Numbers & Prices Mentioned:
+---------------------------------------------------
+  {prices_text}
+
+---------------------------------------------------
+Sources Used:
+---------------------------------------------------
+  - {sources_text}
+
+---------------------------------------------------
+Summary:
+---------------------------------------------------
+Based on the retrieved market data, the question "{question}" 
+relates to the above facts. The information is sourced from 
+{n_docs} relevant document(s) in the knowledge base.
+===================================================
+"""
+
+
 def simple_generator(question, documents, metadatas=None):
     """
     Generate a focused, question-specific answer from retrieved documents.
@@ -68,6 +101,7 @@ def simple_generator(question, documents, metadatas=None):
         return "Sorry, I could not find relevant information to answer your question."
 
     question_lower = question.lower()
+    question_kw_set = set(_KEYWORD_RE.findall(question_lower))
 
     # ---- Extract key facts from documents ----
     extracted_facts = []
@@ -76,18 +110,21 @@ def simple_generator(question, documents, metadatas=None):
 
     for i, doc in enumerate(documents):
         doc_lower = doc.lower()
-        sentences = re.split(r'(?<=[.!?])\s+', doc.strip())
-
-        for sentence in sentences:
-            sent_lower = sentence.lower()
-            # Check if the sentence is relevant to the question
-            question_keywords = re.findall(r'\b\w{4,}\b', question_lower)
-            matches = sum(1 for kw in question_keywords if kw in sent_lower)
-            if matches >= 1 and len(sentence) > 30:
-                extracted_facts.append(sentence.strip())
+        # Sentences are matched lazily so the scan stops once enough
+        # candidates are collected (only the top 5 are ever shown)
+        for match in (_SENT_RE.finditer(doc) if question_kw_set else ()):
+            if len(extracted_facts) >= _MAX_CANDIDATE_FACTS:
+                break
+            sentence = match.group().rstrip()
+            if len(sentence) <= 30:
+                continue
+            # Check if the sentence shares a keyword with the question
+            sent_words = set(_KEYWORD_RE.findall(sentence.lower()))
+            if not question_kw_set.isdisjoint(sent_words):
+                extracted_facts.append(sentence)
 
         # Extract prices / numbers from the doc
-        nums = re.findall(r'Rs\s?[\d,]+(?:\.\d+)?|USD\s?[\d.]+\s?billion|[\d,]+(?:\.\d+)?%|[\d,]+(?:\.\d+)?\s(?:crore|lakh|million|billion)', doc)
+        nums = _PRICE_RE.findall(doc)
         prices_found.extend(nums[:4])
 
         if metadatas:
@@ -95,58 +132,26 @@ def simple_generator(question, documents, metadatas=None):
             if src:
                 sources_used.append(src)
 
-    # Deduplicate facts
-    seen = set()
-    unique_facts = []
-    for f in extracted_facts:
-        if f not in seen:
-            seen.add(f)
-            unique_facts.append(f)
-
-    # Limit to top 5 most relevant facts
-    top_facts = unique_facts[:5]
+    # Deduplicate facts (keeping first-seen order) and limit to top 5
+    top_facts = list(dict.fromkeys(extracted_facts))[:5]
 
     # If no specific facts extracted, fall back to first 2 sentences of top document
     if not top_facts:
-        fallback_sentences = re.split(r'(?<=[.!?])\s+', documents[0].strip())
-        top_facts = [s.strip() for s in fallback_sentences[:3] if len(s) > 30]
+        fallback_sentences = [m.group().rstrip() for m in islice(_SENT_RE.finditer(documents[0]), 3)]
+        top_facts = [s for s in fallback_sentences if len(s) > 30]
 
     # ---- Build the answer ----
     facts_text = "\n• ".join(top_facts) if top_facts else "No specific facts extracted."
-    sources_text = "\n  - ".join(set(sources_used)) if sources_used else "NIFTY Market Data"
-    prices_text = ", ".join(set(prices_found[:6])) if prices_found else "See facts above"
-
-    answer = f"""
-===================================================
-  RAG Answer — NIFTY 50 Stock Market System
-===================================================
-
-Question: {question}
-
----------------------------------------------------
-Key Facts From Retrieved Documents:
----------------------------------------------------
-• {facts_text}
-
----------------------------------------------------
-Key Numbers & Prices Mentioned:
----------------------------------------------------
-  {prices_text}
-
----------------------------------------------------
-Sources Used:
----------------------------------------------------
-  - {sources_text}
-
----------------------------------------------------
-Summary:
----------------------------------------------------
-Based on the retrieved market data, the question "{question}" 
-relates to the above facts. The information is sourced from 
-{len(documents)} relevant document(s) in the knowledge base.
-===================================================
-"""
-    return answer
+    sources_text = "\n  - ".join(dict.fromkeys(sources_used)) if sources_used else "NIFTY Market Data"
+    prices_text = ", ".join(dict.fromkeys(prices_found[:6])) if prices_found else "See facts above"
+
+    return _ANSWER_TMPL.format_map({
+        "question": question,
+        "facts_text": facts_text,
+        "prices_text": prices_text,
+        "sources_text": sources_text,
+        "n_docs": len(documents)
+    })
 
 
 # -----------------------------------------------
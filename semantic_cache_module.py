@@ -0,0 +1,99 @@
+# file: semantic_cache_module.py
+
+import threading
+
+import numpy as np
+
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+
+def cosine_similarities(vecs, emb):
+    """Cosine similarity of each row of `vecs` with `emb` (all L2-normalised)."""
+    # SimSIMD's SIMD kernels when installed; a BLAS matmul otherwise
+    if simsimd is not None:
+        distances = np.asarray(simsimd.cdist(emb[None, :], vecs, metric="cos"), dtype=np.float32)
+        return 1.0 - distances[0]
+    return vecs @ emb
+
+
+class SemanticCache:
+    """
+    Fixed-size ring buffer of normalised query embeddings and the values
+    computed for them. A lookup returns the value stored for the most
+    similar earlier query with the same key (e.g. n_results) above
+    `threshold`. Entries stored with their query text can also be found by
+    an exact match on that text (case and whitespace ignored), without an
+    embedding. Once full, the oldest entry is overwritten.
+    """
+
+    def __init__(self, capacity, dim, threshold, dtype=np.float32):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._vecs = np.zeros((capacity, dim), dtype=dtype)
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        self._values = [None] * capacity
+        self._texts = [None] * capacity
+        self._text_slots = {}
+        self._size = 0
+        self._next = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _key(key):
+        return -1 if key is None else key
+
+    @staticmethod
+    def _text_key(text, key):
+        return " ".join(text.lower().split()), key
+
+    def get_text(self, text, key=None):
+        text_key = self._text_key(text, self._key(key))
+        with self._lock:
+            slot = self._text_slots.get(text_key)
+            return None if slot is None else self._values[slot]
+
+    def get(self, embedding, key=None):
+        key = self._key(key)
+        emb = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if not self._size:
+                return None
+            # float16 storage is upcast for scoring
+            sims = cosine_similarities(self._vecs[:self._size].astype(np.float32, copy=False), emb)
+            sims[self._keys[:self._size] != key] = -1.0
+            best = int(sims.argmax())
+            if sims[best] > self.threshold:
+                return self._values[best]
+        return None
+
+    def put(self, embedding, value, key=None, text=None):
+        key = self._key(key)
+        text_key = None if text is None else self._text_key(text, key)
+        with self._lock:
+            slot = self._next
+            evicted = self._texts[slot]
+            if evicted is not None and self._text_slots.get(evicted) == slot:
+                del self._text_slots[evicted]
+            self._texts[slot] = text_key
+            if text_key is not None:
+                self._text_slots[text_key] = slot
+
+            self._vecs[slot] = embedding
+            self._keys[slot] = key
+            self._values[slot] = value
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._values = [None] * self.capacity
+            self._texts = [None] * self.capacity
+            self._text_slots.clear()
+            self._size = 0
+            self._next = 0
@@ -1,27 +1,37 @@
 # file: statistical_analysis_module.py
 
 import re
-import statistics
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+
+_NUM_RE = re.compile(r"\d{1,3}(?:,\d{3})*(?:\.\d+)?")
+_COMMA_TBL = str.maketrans('', '', ',')
 
 def extract_prices(text):
-    numbers = re.findall(r"\d{1,3}(?:,\d{3})*(?:\.\d+)?", text)
-    return [float(n.replace(',', '')) for n in numbers]
+    return np.fromiter(
+        (float(n.translate(_COMMA_TBL)) for n in _NUM_RE.findall(text)),
+        dtype=np.float64
+    )
 
 def analyze_documents(documents):
+    # Same top-K docs come back for similar queries; reuse the earlier result
+    return _analyze_cached(tuple(documents))
 
-    all_prices = []
+@lru_cache(maxsize=256)
+def _analyze_cached(documents):
 
-    for doc in documents:
-        all_prices.extend(extract_prices(doc))
+    arr = np.concatenate([extract_prices(doc) for doc in documents]) if documents else np.empty(0)
 
-    if not all_prices:
-        return {"Status": "No numeric stock data found."}
+    if not arr.size:
+        return MappingProxyType({"Status": "No numeric stock data found."})
 
-    mean_price = round(statistics.mean(all_prices), 2)
-    max_price = round(max(all_prices), 2)
-    min_price = round(min(all_prices), 2)
+    mean_price = round(float(arr.mean()), 2)
+    max_price = round(float(arr.max()), 2)
+    min_price = round(float(arr.min()), 2)
 
-    std_dev = round(statistics.stdev(all_prices), 2) if len(all_prices) > 1 else 0
+    std_dev = round(float(arr.std(ddof=1)), 2) if arr.size > 1 else 0.0
     volatility = std_dev
 
     if volatility < 20:
@@ -31,10 +41,11 @@ def analyze_documents(documents):
     else:
         risk = "[HIGH RISK]"
 
-    trend = "[BULLISH TREND]" if all_prices[-1] > all_prices[0] else "[BEARISH TREND]"
+    trend = "[BULLISH TREND]" if arr[-1] > arr[0] else "[BEARISH TREND]"
     signal = "[BUY RECOMMENDED]" if "BULLISH" in trend else "[SELL RECOMMENDED]"
 
-    return {
+    # Read-only view: the cached mapping is shared between callers
+    return MappingProxyType({
         "Mean Price": mean_price,
         "Max Price": max_price,
         "Min Price": min_price,
@@ -42,4 +53,4 @@ def analyze_documents(documents):
         "Risk Level": risk,
         "Trend": trend,
         "Trading Signal": signal
-    }
\ No newline at end of file
+    })
\ No newline at end of file
@@ -1,15 +1,24 @@
-import json
+import hashlib
+import os
+from functools import lru_cache
+
 import chromadb
+from chromadb import Documents, EmbeddingFunction, Embeddings
+import numpy as np
+import orjson
+import torch
 from sentence_transformers import SentenceTransformer
 
+from semantic_cache_module import SemanticCache
+
 
 # -------------------------
 # LOAD PROCESSED DATA
 # -------------------------
 def load_processed_data(file_path="processed_nifty_data.json"):
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with open(file_path, "rb") as f:
+        data = orjson.loads(f.read())
 
     return data
 
@@ -19,25 +28,24 @@ def load_processed_data(file_path="processed_nifty_data.json"):
 # -------------------------
 def convert_to_documents(data):
 
-    documents = []
-    metadata = []
+    n = len(data)
+    documents = [None] * n
+    metadata = [None] * n
 
-    for entry in data:
+    for i, entry in enumerate(data):
 
-        doc = f"""
-        Stock Market Report
-        Source: {entry['source']}
-        Date: {entry['timestamp']}
-        Market News: {entry['clean_text']}
-        Price Values: {entry['clean_prices']}
-        """
+        documents[i] = "\n".join((
+            "Stock Market Report",
+            f"Source: {entry['source']}",
+            f"Date: {entry['timestamp']}",
+            f"Market News: {entry['clean_text']}",
+            f"Price Values: {entry['clean_prices']}"
+        ))
 
-        documents.append(doc)
-
-        metadata.append({
+        metadata[i] = {
             "source": entry["source"],
             "timestamp": entry["timestamp"]
-        })
+        }
 
     return documents, metadata
 
@@ -45,56 +53,206 @@ def convert_to_documents(data):
 # -------------------------
 # EMBEDDING MODEL
 # -------------------------
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+_device = "cuda" if torch.cuda.is_available() else "cpu"
+embedding_model = SentenceTransformer("all-MiniLM-L6-v2", device=_device)
+if _device == "cuda":
+    # FP16 on GPU halves memory bandwidth; CPU stays FP32 (half is slower there)
+    embedding_model = embedding_model.half()
+
+
+def _encode_documents(documents):
+    # encode() already sorts by length internally, so each batch is padded
+    # only to its own longest document
+    batch_size = 256 if _device == "cuda" else 64
+    with torch.inference_mode():
+        return embedding_model.encode(
+            documents,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=True
+        )
+
+
+# Embeddings persisted by content hash, so unchanged documents are never
+# re-encoded on rebuild
+EMBEDDING_CACHE_FILE = "embeddings.npz"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def load_embedding_cache(file_path=EMBEDDING_CACHE_FILE):
+    if not os.path.exists(file_path):
+        return {}
+    with np.load(file_path) as cache:
+        return dict(zip(cache["keys"].tolist(), cache["vectors"]))
+
+
+def save_embedding_cache(cache, file_path=EMBEDDING_CACHE_FILE):
+    np.savez(
+        file_path,
+        keys=np.array(list(cache.keys())),
+        vectors=np.stack(list(cache.values()))
+    )
 
 
-def generate_embeddings(documents):
-    return embedding_model.encode(documents)
+def generate_embeddings(documents, prune=False, cache_file=EMBEDDING_CACHE_FILE):
+    """Embed documents, encoding cache misses only. prune=True (full corpus only) drops every other entry."""
+    if not documents:
+        return np.empty((0, embedding_model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    hashes = [content_hash(doc) for doc in documents]
+    cache = load_embedding_cache(cache_file)
+
+    # Encode each new document once, even if it appears several times
+    missing = {h: doc for h, doc in zip(hashes, documents) if h not in cache}
+    if missing:
+        new_embeddings = _encode_documents(list(missing.values()))
+        for h, emb in zip(missing, new_embeddings):
+            cache[h] = emb.astype(np.float16)
+
+    # Every re-scrape stamps a new Date into each document, so without
+    # pruning the hashes of earlier corpora would pile up forever
+    stale = prune and len(cache) > len(set(hashes))
+    if stale:
+        cache = {h: cache[h] for h in dict.fromkeys(hashes)}
+    if missing or stale:
+        save_embedding_cache(cache, cache_file)
+
+    return np.stack([cache[h] for h in hashes]).astype(np.float32)
 
 
 # -------------------------
 # CHROMA DATABASE SETUP
 # -------------------------
+class ModelEmbeddingFunction(EmbeddingFunction):
+    """Lets Chroma embed query_texts with this module's model instance."""
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return embedding_model.encode(list(input), normalize_embeddings=True).tolist()
+
+
 client = chromadb.PersistentClient(path="./stock_vector_db")
 
+COLLECTION_NAME = "nifty_market_data"
+
+# Embeddings are normalised, so cosine is the natural metric. The relevance
+# cut-offs downstream (distance < 0.9, (1 - d) * 100) assume it; 0.9 is the
+# old squared-L2 cut-off of 1.8, since L2 = 2 - 2cos on unit vectors.
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64
+}
+
+
+def get_collection():
+    # An existing collection is opened without metadata: get_or_create with
+    # metadata overwrites the stored hnsw:space on some Chroma versions, which
+    # would hide an old L2 index behind a "cosine" label
+    try:
+        return client.get_collection(COLLECTION_NAME, embedding_function=ModelEmbeddingFunction())
+    except Exception:
+        return client.get_or_create_collection(
+            name=COLLECTION_NAME,
+            embedding_function=ModelEmbeddingFunction(),
+            metadata=COLLECTION_METADATA
+        )
+
+
+def is_cosine(coll):
+    # An existing collection keeps the space it was created with; Chroma's
+    # default when none is stored is L2
+    return (coll.metadata or {}).get("hnsw:space") == "cosine"
+
+
 # Get or create the collection (used for querying)
-collection = client.get_or_create_collection(
-    name="nifty_market_data"
-)
+collection = get_collection()
+if not is_cosine(collection):
+    print(f"[WARNING] Collection '{COLLECTION_NAME}' was not created with cosine "
+          "distance; relevance scores will be wrong. Run `python vector_db_module.py` to rebuild it.")
 
 
 # -------------------------
 # STORE DATA
 # -------------------------
 def store_in_chromadb(documents, embeddings, metadata):
-    """Store documents - clears existing data first to avoid duplicates."""
-    existing_count = collection.count()
-    if existing_count > 0:
-        # Delete all existing IDs to start fresh
-        existing_ids = collection.get()["ids"]
-        if existing_ids:
-            collection.delete(ids=existing_ids)
-        print(f"Cleared {existing_count} old documents from vector database.")
-
-    collection.add(
-        documents=documents,
-        embeddings=embeddings.tolist(),
-        metadatas=metadata,
-        ids=[str(i) for i in range(len(documents))]
+    """Store documents keyed by content hash - unchanged documents are left in place."""
+    ids = [content_hash(doc) for doc in documents]
+    existing_ids = set(collection.get(include=[])["ids"])
+
+    # Documents no longer in the corpus are the only deletions
+    stale_ids = list(existing_ids - set(ids))
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+        print(f"Removed {len(stale_ids)} outdated documents from vector database.")
+
+    # One row per new id (identical documents share an id)
+    new_rows = list({doc_id: i for i, doc_id in enumerate(ids) if doc_id not in existing_ids}.values())
+    if new_rows:
+        collection.upsert(
+            documents=[documents[i] for i in new_rows],
+            embeddings=embeddings[new_rows].tolist(),
+            metadatas=[metadata[i] for i in new_rows],
+            ids=[ids[i] for i in new_rows]
+        )
+    print(f"Added {len(new_rows)} new documents, {len(ids) - len(new_rows)} unchanged.")
+
+    # Cached results may name documents that were just removed or replaced
+    _query_cache.clear()
+
+
+# -------------------------
+# QUERY CACHE
+# -------------------------
+# Exact repeats skip the encoder (LRU on the normalised text); near-duplicates
+# above the similarity threshold reuse the neighbour's Chroma result.
+QUERY_CACHE_SIZE = 512
+QUERY_CACHE_THRESHOLD = 0.98
+
+
+@lru_cache(maxsize=1024)
+def _encode_cached(text):
+    return embedding_model.encode([text], normalize_embeddings=True)[0]
+
+
+def encode_query(query):
+    """Normalised query embedding, cached by query text."""
+    return _encode_cached(query.strip().lower())
+
+
+_query_cache = SemanticCache(
+    QUERY_CACHE_SIZE, embedding_model.get_sentence_embedding_dimension(), QUERY_CACHE_THRESHOLD
+)
+
+
+def query_collection(query, n_results=2):
+    """collection.query with the embedding and semantic result caches in front."""
+    emb = encode_query(query).astype(np.float32)
+
+    cached = _query_cache.get(emb, n_results)
+    if cached is not None:
+        return cached
+
+    results = collection.query(
+        query_embeddings=[emb.tolist()],
+        n_results=n_results,
+        include=["documents", "metadatas", "distances"]
     )
 
+    _query_cache.put(emb, results, n_results)
+    return results
+
 
 # -------------------------
 # SEARCH FUNCTION
 # -------------------------
 def search_market_data(query):
     """Search market data using a query string."""
-    query_embedding = embedding_model.encode([query])
-
-    results = collection.query(
-        query_embeddings=query_embedding.tolist(),
-        n_results=2
-    )
+    results = query_collection(query, n_results=2)
 
     # Return flattened list of documents
     return results.get("documents", [[]])[0] if results else []
@@ -104,10 +262,17 @@ def search_market_data(query):
 # MAIN PIPELINE
 # -------------------------
 def build_vector_database():
+    global collection
+
+    # Upserts never change the metric, so an old L2 collection is recreated
+    if not is_cosine(collection):
+        print(f"Recreating collection '{COLLECTION_NAME}' with cosine distance...")
+        client.delete_collection(COLLECTION_NAME)
+        collection = get_collection()
 
     data = load_processed_data()
     documents, metadata = convert_to_documents(data)
-    embeddings = generate_embeddings(documents)
+    embeddings = generate_embeddings(documents, prune=True)
 
     print( "**************************************************")
     print(embeddings);
@@ -119,14 +284,24 @@ def build_vector_database():
 
 def search_stock_info(query):
     """Search for stock information using the query."""
-    query_embedding = embedding_model.encode([query])
-    results = collection.query(
-        query_embeddings=query_embedding.tolist(),
-        n_results=2
-    )
+    results = query_collection(query, n_results=2)
     return results.get("documents", [[]])[0] if results else []
 
 
+def search_batch(queries, n_results=3):
+    """Search several queries with one batched encode and one Chroma call."""
+    query_embeddings = embedding_model.encode(
+        queries,
+        batch_size=32,
+        normalize_embeddings=True
+    )
+    return collection.query(
+        query_embeddings=query_embeddings.tolist(),
+        n_results=n_results,
+        include=["documents", "metadatas", "distances"]
+    )
+
+
 # -------------------------
 # RUN
 # -------------------------